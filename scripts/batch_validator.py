@@ -5,34 +5,58 @@ Genera reporte consolidado para presentación
 """
 
 import os
-import glob
+import queue
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime
-from financial_validator import FinancialReportValidator
-from config import IMAGES_DIR, RESULTS_DIR
+from typing import List
+from financial_validator import FinancialReportValidator, format_money
+from config import IMAGES_DIR, RESULTS_DIR, MAX_WORKERS, VISION_BATCH_SIZE
+
+# Tamaño máximo de la cola entre el OCR y la validación (limita la memoria usada)
+QUEUE_MAXSIZE = 32
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif'}
+
+@dataclass(slots=True)
+class ReportSummary:
+    """Resumen de la validación de una imagen (cantidades en centavos)"""
+    filename: str
+    status: str
+    message: str
+    calculated_sum: int = 0
+    reported_total: int = 0
+    difference: int = 0
+    valid: bool = False
+    data_amounts: List[int] = field(default_factory=list)
 
 class BatchValidator:
-    def __init__(self):
+    def __init__(self, max_workers: int = MAX_WORKERS):
         self.validator = FinancialReportValidator()
         self.results = []
+        self.max_workers = max_workers
+        self._results_lock = threading.Lock()
+        self._total_images = 0
         
     def find_all_images(self):
-        """Encuentra todas las imágenes en la carpeta images/"""
+        """
+        Encuentra todas las imágenes en la carpeta images/
+        Devuelve tuplas (ruta, stat) con el stat que os.scandir ya trae en caché
+        """
         if not os.path.exists(IMAGES_DIR):
             print(f"❌ Carpeta no encontrada: {IMAGES_DIR}")
             return []
         
-        # Buscar archivos de imagen
-        image_extensions = ['*.jpg', '*.jpeg', '*.png', '*.bmp', '*.gif']
-        image_files = []
-        
-        for extension in image_extensions:
-            pattern = os.path.join(IMAGES_DIR, extension)
-            image_files.extend(glob.glob(pattern))
-            # También buscar en mayúsculas
-            pattern_upper = os.path.join(IMAGES_DIR, extension.upper())
-            image_files.extend(glob.glob(pattern_upper))
+        # Buscar archivos de imagen en una sola lectura del directorio
+        # (la extensión se compara en minúsculas, así que cubre también mayúsculas;
+        # los archivos ocultos como ._imagen.png se omiten, igual que con glob)
+        image_files = [
+            (entry.path, entry.stat()) for entry in os.scandir(IMAGES_DIR)
+            if not entry.name.startswith('.') and entry.is_file()
+            and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+        ]
         
-        return sorted(image_files)
+        return sorted(image_files, key=lambda item: item[0])
     
     def process_all_images(self):
         """Procesa todas las imágenes encontradas"""
@@ -48,63 +72,105 @@ class BatchValidator:
         print(f"📸 Imágenes encontradas: {len(image_files)}")
         print("-" * 60)
         
-        # Procesar cada imagen
-        for i, image_path in enumerate(image_files, 1):
-            filename = os.path.basename(image_path)
-            print(f"\n[{i}/{len(image_files)}] 📋 Procesando: {filename}")
-            
-            try:
-                # Procesar imagen (sin guardar resultados individuales para limpiar output)
-                result = self.validator.process_financial_report(image_path)
-                
-                # Guardar resultado resumido
-                summary = self.extract_summary(result, filename)
-                self.results.append(summary)
-                
-                print(f"    ✅ Procesado: {summary['status']}")
-                
-            except Exception as e:
-                error_summary = {
-                    'filename': filename,
-                    'status': '❌ ERROR',
-                    'message': f'Error procesando imagen: {str(e)}',
-                    'calculated_sum': 0,
-                    'reported_total': 0,
-                    'difference': 0,
-                    'valid': False
-                }
-                self.results.append(error_summary)
-                print(f"    ❌ Error: {str(e)}")
+        # Pipeline: un hilo productor obtiene el OCR por lotes mientras
+        # varios hilos consumidores validan el texto ya extraído
+        print(f"🔍 Extrayendo texto con Vision API (lotes de {VISION_BATCH_SIZE})...")
+        self._total_images = len(image_files)
+        text_queue = queue.Queue(maxsize=QUEUE_MAXSIZE)
+        num_consumers = max(1, self.max_workers)
+        
+        producer = threading.Thread(
+            target=self._ocr_producer,
+            args=(image_files, text_queue, num_consumers)
+        )
+        consumers = [
+            threading.Thread(target=self._validation_consumer, args=(text_queue,))
+            for _ in range(num_consumers)
+        ]
+        
+        producer.start()
+        for consumer in consumers:
+            consumer.start()
+        
+        producer.join()
+        for consumer in consumers:
+            consumer.join()
+        
+        # Mantener el orden original de los archivos en el reporte
+        self.results.sort(key=lambda r: r.filename)
         
         # Generar reporte consolidado
         self.generate_consolidated_report()
     
+    def _ocr_producer(self, image_files, text_queue, num_consumers):
+        """Obtiene el OCR por lotes y lo encola para los consumidores"""
+        try:
+            for start in range(0, len(image_files), VISION_BATCH_SIZE):
+                chunk = image_files[start:start + VISION_BATCH_SIZE]
+                stats = dict(chunk)
+                texts = self.validator.extract_text_from_images_batch(list(stats), stats)
+                for image_path, _ in chunk:
+                    text_queue.put((image_path, texts.get(image_path, "")))
+        finally:
+            # Un centinela por consumidor para indicar que no hay más trabajo
+            for _ in range(num_consumers):
+                text_queue.put((None, None))
+    
+    def _validation_consumer(self, text_queue):
+        """Procesa el texto encolado hasta recibir el centinela"""
+        while True:
+            image_path, raw_text = text_queue.get()
+            if image_path is None:
+                break
+            self.process_single_image(image_path, raw_text)
+    
+    def process_single_image(self, image_path, raw_text=None):
+        """Procesa una imagen y guarda su resumen (se ejecuta en un hilo consumidor)"""
+        filename = os.path.basename(image_path)
+        
+        try:
+            # Procesar imagen (sin guardar resultados individuales para limpiar output)
+            result = self.validator.process_financial_report(image_path, raw_text, verbose=False)
+            
+            # Guardar resultado resumido
+            summary = self.extract_summary(result, filename)
+            
+        except Exception as e:
+            summary = ReportSummary(
+                filename=filename,
+                status='❌ ERROR',
+                message=f'Error procesando imagen: {str(e)}'
+            )
+            print(f"    ❌ Error en {filename}: {str(e)}")
+        
+        with self._results_lock:
+            self.results.append(summary)
+            print(f"\n[{len(self.results)}/{self._total_images}] 📋 {filename}: {summary.status}")
+        
+        return summary
+    
     def extract_summary(self, result, filename):
         """Extrae resumen de un resultado individual"""
         if 'error' in result:
-            return {
-                'filename': filename,
-                'status': '❌ ERROR',
-                'message': result['error'],
-                'calculated_sum': 0,
-                'reported_total': 0,
-                'difference': 0,
-                'valid': False
-            }
+            return ReportSummary(
+                filename=filename,
+                status='❌ ERROR',
+                message=result['error']
+            )
         
         validation = result.get('validation', {})
         summary_info = validation.get('summary', {})
         
-        return {
-            'filename': filename,
-            'status': summary_info.get('status', '⚠️ DESCONOCIDO'),
-            'message': summary_info.get('message', 'No disponible'),
-            'calculated_sum': validation.get('calculated_sum', 0),
-            'reported_total': validation.get('reported_total', 0),
-            'difference': validation.get('difference', 0),
-            'valid': validation.get('valid', False),
-            'data_amounts': validation.get('data_amounts', [])
-        }
+        return ReportSummary(
+            filename=filename,
+            status=summary_info.get('status', '⚠️ DESCONOCIDO'),
+            message=summary_info.get('message', 'No disponible'),
+            calculated_sum=validation.get('calculated_sum', 0),
+            reported_total=validation.get('reported_total', 0),
+            difference=validation.get('difference', 0),
+            valid=validation.get('valid', False),
+            data_amounts=validation.get('data_amounts', [])
+        )
     
     def generate_consolidated_report(self):
         """Genera reporte consolidado de todos los resultados"""
@@ -112,11 +178,18 @@ class BatchValidator:
         print("📊 REPORTE CONSOLIDADO - VALIDACIÓN DE REPORTES FINANCIEROS")
         print("=" * 80)
         
-        # Estadísticas generales
+        # Estadísticas generales (una sola pasada sobre los resultados)
         total_images = len(self.results)
-        valid_reports = sum(1 for r in self.results if r['valid'])
-        invalid_reports = sum(1 for r in self.results if not r['valid'] and '❌ ERROR' not in r['status'])
-        error_reports = sum(1 for r in self.results if '❌ ERROR' in r['status'])
+        valid_reports = invalid_reports = error_reports = 0
+        financial_errors = []
+        for r in self.results:
+            if r.valid:
+                valid_reports += 1
+            elif '❌ ERROR' in r.status:
+                error_reports += 1
+            else:
+                invalid_reports += 1
+                financial_errors.append(r)
         
         print(f"📈 ESTADÍSTICAS GENERALES:")
         print(f"   Total de reportes procesados: {total_images}")
@@ -130,33 +203,35 @@ class BatchValidator:
         print("-" * 80)
         
         for i, result in enumerate(self.results, 1):
-            print(f"{i:2d}. 📄 {result['filename']}")
-            print(f"    Estado: {result['status']}")
+            print(f"{i:2d}. 📄 {result.filename}")
+            print(f"    Estado: {result.status}")
+            
+            is_valid = result.valid
+            is_error = '❌ ERROR' in result.status
             
-            if result['valid'] or '❌ ERROR' not in result['status']:
-                print(f"    Suma calculada: ${result['calculated_sum']:,.2f}")
-                print(f"    Total reportado: ${result['reported_total']:,.2f}")
-                if result['difference'] > 0:
-                    print(f"    Diferencia: ${result['difference']:,.2f}")
+            if is_valid or not is_error:
+                print(f"    Suma calculada: {format_money(result.calculated_sum)}")
+                print(f"    Total reportado: {format_money(result.reported_total)}")
+                if result.difference > 0:
+                    print(f"    Diferencia: {format_money(result.difference)}")
             
-            if not result['valid'] and '❌ ERROR' not in result['status']:
-                print(f"    ⚠️ PROBLEMA DETECTADO: {result['message']}")
-            elif '❌ ERROR' in result['status']:
-                print(f"    🔧 Error técnico: {result['message']}")
+            if not is_valid and not is_error:
+                print(f"    ⚠️ PROBLEMA DETECTADO: {result.message}")
+            elif is_error:
+                print(f"    🔧 Error técnico: {result.message}")
             
             print()
         
         # Resumen de errores encontrados
-        financial_errors = [r for r in self.results if not r['valid'] and '❌ ERROR' not in r['status']]
         if financial_errors:
             print("🔍 ANÁLISIS DE ERRORES FINANCIEROS DETECTADOS:")
             print("-" * 50)
-            total_error_amount = sum(r['difference'] for r in financial_errors)
-            print(f"Total en discrepancias detectadas: ${total_error_amount:,.2f}")
+            total_error_amount = sum(r.difference for r in financial_errors)
+            print(f"Total en discrepancias detectadas: {format_money(total_error_amount)}")
             
             for result in financial_errors:
-                error_percentage = (result['difference'] / result['reported_total'] * 100) if result['reported_total'] > 0 else 0
-                print(f"• {result['filename']}: ${result['difference']:,.2f} ({error_percentage:.1f}% error)")
+                error_percentage = (result.difference / result.reported_total * 100) if result.reported_total > 0 else 0
+                print(f"• {result.filename}: {format_money(result.difference)} ({error_percentage:.1f}% error)")
         
         # Guardar reporte en archivo
         self.save_consolidated_report()
@@ -174,30 +249,35 @@ class BatchValidator:
             
             os.makedirs(RESULTS_DIR, exist_ok=True)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write("REPORTE CONSOLIDADO - VALIDACIÓN DE REPORTES FINANCIEROS\n")
-                f.write("=" * 60 + "\n")
-                f.write(f"Fecha y hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"Total de reportes: {len(self.results)}\n\n")
+            # Armar el contenido completo y escribirlo de una sola vez
+            valid_count = sum(1 for r in self.results if r.valid)
+            parts = [
+                "REPORTE CONSOLIDADO - VALIDACIÓN DE REPORTES FINANCIEROS\n",
+                "=" * 60 + "\n",
+                f"Fecha y hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+                f"Total de reportes: {len(self.results)}\n\n",
                 
                 # Estadísticas
-                valid_count = sum(1 for r in self.results if r['valid'])
-                f.write("ESTADÍSTICAS:\n")
-                f.write(f"  Correctos: {valid_count}\n")
-                f.write(f"  Con errores: {len(self.results) - valid_count}\n")
-                f.write(f"  Tasa de éxito: {(valid_count/len(self.results)*100):.1f}%\n\n")
+                "ESTADÍSTICAS:\n",
+                f"  Correctos: {valid_count}\n",
+                f"  Con errores: {len(self.results) - valid_count}\n",
+                f"  Tasa de éxito: {(valid_count/len(self.results)*100):.1f}%\n\n",
                 
                 # Detalles
-                f.write("DETALLES POR REPORTE:\n")
-                f.write("-" * 40 + "\n")
-                
-                for i, result in enumerate(self.results, 1):
-                    f.write(f"{i}. {result['filename']}\n")
-                    f.write(f"   Estado: {result['status']}\n")
-                    f.write(f"   Calculado: ${result['calculated_sum']:,.2f}\n")
-                    f.write(f"   Reportado: ${result['reported_total']:,.2f}\n")
-                    f.write(f"   Diferencia: ${result['difference']:,.2f}\n")
-                    f.write(f"   Válido: {'Sí' if result['valid'] else 'No'}\n\n")
+                "DETALLES POR REPORTE:\n",
+                "-" * 40 + "\n",
+            ]
+            
+            for i, result in enumerate(self.results, 1):
+                parts.append(f"{i}. {result.filename}\n")
+                parts.append(f"   Estado: {result.status}\n")
+                parts.append(f"   Calculado: {format_money(result.calculated_sum)}\n")
+                parts.append(f"   Reportado: {format_money(result.reported_total)}\n")
+                parts.append(f"   Diferencia: {format_money(result.difference)}\n")
+                parts.append(f"   Válido: {'Sí' if result.valid else 'No'}\n\n")
+            
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(''.join(parts))
             
             print(f"💾 Reporte guardado en: {filepath}")
             
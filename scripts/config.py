@@ -11,4 +11,10 @@ os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = VISION_KEY_PATH
 # Carpetas del proyecto
 BASE_DIR = r"C:\Users\irisc\Documents\vision-validator"
 IMAGES_DIR = os.path.join(BASE_DIR, "images")
-RESULTS_DIR = os.path.join(BASE_DIR, "results")
\ No newline at end of file
+RESULTS_DIR = os.path.join(BASE_DIR, "results")
+
+# Número de hilos para el procesamiento por lotes (trabajo limitado por I/O de Vision API)
+MAX_WORKERS = 8
+
+# Máximo de imágenes por llamada a batch_annotate_images (límite de Vision API)
+VISION_BATCH_SIZE = 16
\ No newline at end of file
@@ -7,21 +7,80 @@ Especializado en detectar números monetarios y totales
 import sys
 import os
 import re
+from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 from google.cloud import vision
-from config import PROJECT_ID, IMAGES_DIR, RESULTS_DIR
+from config import IMAGES_DIR, RESULTS_DIR, VISION_BATCH_SIZE
+from ocr_cache import content_key, stat_key, load_cached_text, store_cached_text
+from validator_base import BaseValidator
 
-class FinancialReportValidator:
+# Patrones precompilados para extraer cantidades monetarias
+_RE_DOLLAR = re.compile(r'\$[\d,]+\.?\d*')
+_RE_PLAIN = re.compile(r'\b[\d,]+\.?\d*\b')
+_NO_PUNCT = str.maketrans('', '', '$,')
+_HAS_DIGIT = re.compile(r'\d')
+_TOTAL_KWS = ('total', 'suma', 'subtotal')
+
+# Tolerancia de $10 expresada en centavos
+MAX_DIFFERENCE_CENTS = 1000
+
+def parse_cents(raw_amount: str) -> int:
+    """
+    Convierte una cantidad como '$120,000.50' a centavos enteros (12000050)
+    Los decimales extra se redondean al centavo
+    """
+    whole, _, frac = raw_amount.translate(_NO_PUNCT).partition('.')
+    if not whole and not frac:
+        raise ValueError(f'Cantidad inválida: {raw_amount!r}')
+    
+    cents = int(whole or '0') * 100 + int(frac[:2].ljust(2, '0'))
+    if len(frac) > 2 and frac[2] >= '5':
+        cents += 1
+    return cents
+
+def format_money(cents: int) -> str:
+    """Da formato de moneda a una cantidad en centavos (ej: $120,000.50)"""
+    return f"${cents / 100:,.2f}"
+
+def _lookup_cached_text(image_path: str,
+                        stat_result: Optional[os.stat_result] = None) -> Tuple[Optional[str], Optional[bytes], List[str]]:
+    """
+    Busca el OCR de una imagen en la caché en disco
+    Primero por metadatos (tamaño + fecha, sin leer la imagen) y luego por SHA-256 del contenido
+    
+    Returns:
+        Tuple: (texto o None, bytes de la imagen si se leyeron, claves donde guardar el nuevo OCR)
+    """
+    if stat_result is None:
+        stat_result = os.stat(image_path)
+    
+    fast_key = stat_key(image_path, stat_result)
+    cached = load_cached_text(fast_key)
+    if cached is not None:
+        return cached, None, []
+    
+    content = Path(image_path).read_bytes()
+    key = content_key(content)
+    cached = load_cached_text(key)
+    if cached is not None:
+        store_cached_text(fast_key, cached)
+        return cached, content, []
+    
+    return None, content, [key, fast_key]
+
+class FinancialReportValidator(BaseValidator):
     def __init__(self):
         """Inicializa el validador financiero"""
-        self.client = vision.ImageAnnotatorClient()
-        self.project_id = PROJECT_ID
-        
-    def extract_text_from_image(self, image_path: str) -> str:
-        """Extrae texto usando Vision API"""
+        super().__init__()
+    
+    def extract_text_from_image(self, image_path: str,
+                                stat_result: Optional[os.stat_result] = None) -> str:
+        """Extrae texto usando Vision API (con caché en disco por contenido)"""
         try:
-            with open(image_path, 'rb') as image_file:
-                content = image_file.read()
+            # Reutilizar OCR previo si la imagen no ha cambiado
+            cached, content, cache_keys = _lookup_cached_text(image_path, stat_result)
+            if cached is not None:
+                return cached
             
             image = vision.Image(content=content)
             response = self.client.text_detection(image=image)
@@ -30,59 +89,121 @@ class FinancialReportValidator:
                 raise Exception(f'Error de Vision API: {response.error.message}')
             
             texts = response.text_annotations
-            if texts:
-                return texts[0].description
-            else:
-                return ""
+            text = texts[0].description if texts else ""
+            for key in cache_keys:
+                store_cached_text(key, text)
+            return text
                 
         except Exception as e:
-            print(f"❌ Error extrayendo texto: {e}")
+            self._log(f"❌ Error extrayendo texto: {e}")
             return ""
     
+    def extract_text_from_images_batch(self, image_paths: List[str],
+                                       stats: Optional[Dict[str, os.stat_result]] = None) -> Dict[str, str]:
+        """
+        Extrae texto de varias imágenes usando batch_annotate_images
+        Agrupa hasta VISION_BATCH_SIZE imágenes por llamada a Vision API
+        Las imágenes con OCR en caché no se envían
+        stats permite pasar el stat ya conocido de cada ruta (ej: de os.scandir)
+        """
+        texts = {}
+        stats = stats or {}
+        
+        for start in range(0, len(image_paths), VISION_BATCH_SIZE):
+            chunk = image_paths[start:start + VISION_BATCH_SIZE]
+            pending = []  # (ruta, claves de caché, request) de imágenes sin caché
+            for image_path in chunk:
+                # Un error al leer una imagen solo afecta a esa imagen, no al lote
+                try:
+                    cached, content, cache_keys = _lookup_cached_text(image_path, stats.get(image_path))
+                except Exception as e:
+                    self._log(f"❌ Error leyendo {os.path.basename(image_path)}: {e}")
+                    texts[image_path] = ""
+                    continue
+                
+                if cached is not None:
+                    texts[image_path] = cached
+                    continue
+                
+                pending.append((image_path, cache_keys, vision.AnnotateImageRequest(
+                    image=vision.Image(content=content),
+                    features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)]
+                )))
+            
+            if not pending:
+                continue
+            
+            try:
+                response = self.client.batch_annotate_images(
+                    requests=[request for _, _, request in pending]
+                )
+                
+                for (image_path, cache_keys, _), image_response in zip(pending, response.responses):
+                    if image_response.error.message:
+                        self._log(f"❌ Error de Vision API en {os.path.basename(image_path)}: "
+                                  f"{image_response.error.message}")
+                        texts[image_path] = ""
+                        continue
+                    
+                    annotations = image_response.text_annotations
+                    text = annotations[0].description if annotations else ""
+                    for key in cache_keys:
+                        store_cached_text(key, text)
+                    texts[image_path] = text
+                        
+            except Exception as e:
+                self._log(f"❌ Error extrayendo texto del lote: {e}")
+                for image_path, _, _ in pending:
+                    texts.setdefault(image_path, "")
+        
+        return texts
+    
     def extract_financial_amounts(self, text: str) -> List[Dict]:
         """
         Extrae cantidades monetarias del texto
         Maneja formatos como $120,000, 350,000, o $8,400
+        Las cantidades se guardan como centavos enteros
         """
         financial_data = []
         lines = text.split('\n')
         
         for line_num, line in enumerate(lines):
-            line = line.strip()
-            if not line:
+            # Descartar rápido las líneas sin dígitos (etiquetas, encabezados)
+            if not _HAS_DIGIT.search(line):
                 continue
+            
+            line = line.strip()
                 
             # Buscar cantidades monetarias con múltiples patrones
             amounts = []
+            max_amount = 0
             
             # Patrón 1: Con símbolo $ (ej: $120,000)
-            money_with_dollar = re.findall(r'\$[\d,]+\.?\d*', line)
-            for match in money_with_dollar:
-                clean_amount = re.sub(r'[$,]', '', match)
+            for match in _RE_DOLLAR.findall(line):
                 try:
-                    amount = float(clean_amount)
-                    if amount > 0:
-                        amounts.append(amount)
+                    amount = parse_cents(match)
                 except ValueError:
                     continue
+                if amount > 0:
+                    amounts.append(amount)
+                    if amount > max_amount:
+                        max_amount = amount
             
-            # Patrón 2: Solo números con comas (ej: 350,000) - SOLO si parece contexto financiero
-            if not amounts:  # Solo si no encontramos números con $
-                # Buscar números grandes con comas
-                plain_numbers = re.findall(r'\b[\d,]+\.?\d*\b', line)
-                for match in plain_numbers:
-                    # Verificar si es un número financiero significativo
-                    clean_amount = re.sub(r'[,]', '', match)
+            # Patrón 2: Solo números con comas (ej: 350,000) - SOLO si no encontramos números con $
+            if not amounts:
+                for match in _RE_PLAIN.findall(line):
                     try:
-                        amount = float(clean_amount)
-                        # Solo incluir si es >= 1000 (números financieros significativos)
-                        if amount >= 1000:
-                            amounts.append(amount)
+                        amount = parse_cents(match)
                     except ValueError:
                         continue
+                    # Solo incluir si es >= $1000 (números financieros significativos)
+                    if amount >= 100000:
+                        amounts.append(amount)
+                        if amount > max_amount:
+                            max_amount = amount
             
-            # ELIMINAR DUPLICADOS - tomar solo valores únicos
-            amounts = list(set(amounts))
+            # ELIMINAR DUPLICADOS - tomar solo valores únicos conservando el orden
+            amounts = list(dict.fromkeys(amounts))
             
             # Si encontramos cantidades, guardar información de la línea
             if amounts:
@@ -90,21 +211,22 @@ class FinancialReportValidator:
                 is_total_line = False
                 
                 # Verificar línea actual
-                if any(keyword in line.lower() for keyword in ['total', 'suma', 'subtotal']):
+                lowered = line.lower()
+                if any(keyword in lowered for keyword in _TOTAL_KWS):
                     is_total_line = True
                 
                 # Verificar línea anterior si existe
                 elif line_num > 0:
                     prev_line = lines[line_num-1].lower()
-                    if any(keyword in prev_line for keyword in ['total', 'suma', 'subtotal']):
+                    if any(keyword in prev_line for keyword in _TOTAL_KWS):
                         is_total_line = True
                 
                 financial_data.append({
                     'line_number': line_num,
                     'text': line,
-                    'amounts': amounts,
+                    'amounts_cents': amounts,
                     'is_total': is_total_line,
-                    'max_amount': max(amounts) if amounts else 0
+                    'max_amount_cents': max_amount
                 })
         
         return financial_data
@@ -118,47 +240,34 @@ class FinancialReportValidator:
         
         # Buscar el número más grande (probable total)
         if financial_data:
-            largest_amount = max(item['max_amount'] for item in financial_data)
-            largest_item = None
+            largest_item = max(financial_data, key=lambda item: item['max_amount_cents'])
+            largest_amount = largest_item['max_amount_cents']
             
+            # Una sola pasada: los demás son filas de datos y aportan a la suma
+            other_amounts = []
             for item in financial_data:
-                if item['max_amount'] == largest_amount:
-                    largest_item = item
-                    break
+                if item is largest_item:
+                    continue
+                other_amounts.extend(item['amounts_cents'])
+                data_rows.append(item)
             
-            # Verificar si el número más grande podría ser el total
-            if largest_item:
-                other_amounts = []
-                for other_item in financial_data:
-                    if other_item != largest_item:
-                        other_amounts.extend(other_item['amounts'])
-                
-                # Calcular suma de otros números
-                calculated_sum = sum(other_amounts)
-                difference = abs(calculated_sum - largest_amount)
-                
-                print(f"🔍 Análisis de total:")
-                print(f"   Número más grande: ${largest_amount:,.2f}")
-                print(f"   Suma de otros números: ${calculated_sum:,.2f}")
-                print(f"   Diferencia: ${difference:,.2f}")
-                
-                # Si la diferencia es significativa, reportar error
-                # Si la diferencia es pequeña, es el total correcto
-                total_rows.append({
-                    **largest_item,
-                    'is_total': True,
-                    'detected_as_total': True,
-                    'calculation_matches': difference <= 10
-                })
-                
-                # Los demás son filas de datos
-                for item in financial_data:
-                    if item != largest_item:
-                        data_rows.append(item)
+            # Calcular suma de otros números
+            calculated_sum = sum(other_amounts)
+            difference = abs(calculated_sum - largest_amount)
+            
+            self._log(f"🔍 Análisis de total:")
+            self._log(f"   Número más grande: {format_money(largest_amount)}")
+            self._log(f"   Suma de otros números: {format_money(calculated_sum)}")
+            self._log(f"   Diferencia: {format_money(difference)}")
             
-            else:
-                # Fallback: todos son datos si no encontramos patrón claro
-                data_rows = financial_data
+            # Si la diferencia es significativa, reportar error
+            # Si la diferencia es pequeña, es el total correcto
+            total_rows.append({
+                **largest_item,
+                'is_total': True,
+                'detected_as_total': True,
+                'calculation_matches': difference <= MAX_DIFFERENCE_CENTS
+            })
         
         return {
             'data_rows': data_rows,
@@ -168,6 +277,7 @@ class FinancialReportValidator:
     def validate_financial_calculations(self, data_rows: List[Dict], total_rows: List[Dict]) -> Dict:
         """
         Valida los cálculos financieros
+        Todas las cantidades del resultado se expresan en centavos
         """
         results = {
             'valid': False,
@@ -182,10 +292,10 @@ class FinancialReportValidator:
         # Extraer cantidades de las filas de datos
         data_amounts = []
         for row in data_rows:
-            if row['amounts']:
-                amount = max(row['amounts'])  # Tomar el número más grande de cada línea
+            if row['amounts_cents']:
+                amount = row['max_amount_cents']  # Tomar el número más grande de cada línea
                 data_amounts.append(amount)
-                print(f"   {row['text'][:50]}... → ${amount:,.2f}")
+                self._log(f"   {row['text'][:50]}... → {format_money(amount)}")
         
         if not data_amounts:
             results['summary'] = {
@@ -196,32 +306,29 @@ class FinancialReportValidator:
         
         # Calcular suma
         calculated_sum = sum(data_amounts)
-        print(f"\n💰 Suma calculada: ${calculated_sum:,.2f}")
+        self._log(f"\n💰 Suma calculada: {format_money(calculated_sum)}")
         
         # Buscar total reportado
         reported_total = 0
         if total_rows:
-            total_amounts = []
-            for row in total_rows:
-                total_amounts.extend(row['amounts'])
-            if total_amounts:
-                reported_total = max(total_amounts)
-                print(f"📊 Total reportado: ${reported_total:,.2f}")
+            reported_total = max(row['max_amount_cents'] for row in total_rows)
+            if reported_total:
+                self._log(f"📊 Total reportado: {format_money(reported_total)}")
         
         # Validar
         difference = abs(calculated_sum - reported_total)
-        is_valid = difference <= 10  # Tolerancia de $10
+        is_valid = difference <= MAX_DIFFERENCE_CENTS  # Tolerancia de $10
         
         # Determinar el mensaje apropiado
         if difference == 0:
             status_msg = '✅ CÁLCULO CORRECTO'
             detail_msg = 'La suma coincide exactamente con el total reportado'
-        elif difference <= 10:
+        elif difference <= MAX_DIFFERENCE_CENTS:
             status_msg = '✅ CÁLCULO CORRECTO (diferencia mínima)'
-            detail_msg = f'Diferencia menor a $10 (${difference:.2f}) - probablemente redondeo'
+            detail_msg = f'Diferencia menor a $10 ({format_money(difference)}) - probablemente redondeo'
         else:
             status_msg = '❌ ERROR EN CÁLCULO DETECTADO'
-            detail_msg = f'La suma no coincide con el total. Diferencia: ${difference:,.2f}'
+            detail_msg = f'La suma no coincide con el total. Diferencia: {format_money(difference)}'
         
         results.update({
             'valid': is_valid,
@@ -242,58 +349,71 @@ class FinancialReportValidator:
         
         return results
     
-    def process_financial_report(self, image_path: str) -> Dict:
+    def process_financial_report(self, image_path: str, raw_text: Optional[str] = None,
+                                 verbose: bool = True) -> Dict:
         """
         Procesa un reporte financiero completo
+        Si se recibe raw_text (OCR ya obtenido por lotes) no se vuelve a llamar a Vision API
+        Con verbose=False la salida del reporte se acumula y se emite de una sola vez
+        (modo por lotes: evita que se mezcle la salida de varios hilos)
         """
-        print(f"\n💰 Procesando reporte financiero: {os.path.basename(image_path)}")
-        print("=" * 60)
+        if verbose:
+            return self._process_financial_report(image_path, raw_text)
+        
+        with self._buffered_output():
+            return self._process_financial_report(image_path, raw_text)
+    
+    def _process_financial_report(self, image_path: str, raw_text: Optional[str]) -> Dict:
+        """Pasos del procesamiento de un reporte (ver process_financial_report)"""
+        self._log(f"\n💰 Procesando reporte financiero: {os.path.basename(image_path)}")
+        self._log("=" * 60)
         
         # Extraer texto
-        print("🔍 Extrayendo texto con Vision API...")
-        raw_text = self.extract_text_from_image(image_path)
+        if raw_text is None:
+            self._log("🔍 Extrayendo texto con Vision API...")
+            raw_text = self.extract_text_from_image(image_path)
         
         if not raw_text:
             return {'error': 'No se pudo extraer texto de la imagen'}
         
-        print("🔍 Texto extraído:")
-        print("-" * 30)
-        print(raw_text)
-        print("-" * 30)
+        self._log("🔍 Texto extraído:")
+        self._log("-" * 30)
+        self._log(raw_text)
+        self._log("-" * 30)
         
         # Extraer cantidades monetarias
-        print("\n💵 Extrayendo cantidades monetarias...")
+        self._log("\n💵 Extrayendo cantidades monetarias...")
         financial_data = self.extract_financial_amounts(raw_text)
         
         if not financial_data:
             return {'error': 'No se encontraron cantidades monetarias'}
         
-        print("Cantidades detectadas:")
+        self._log("Cantidades detectadas:")
         for item in financial_data:
-            amounts_str = ", ".join([f"${amt:,.2f}" for amt in item['amounts']])
+            amounts_str = ", ".join([format_money(amt) for amt in item['amounts_cents']])
             total_flag = " (TOTAL)" if item['is_total'] else ""
-            print(f"  {item['text'][:40]}... → {amounts_str}{total_flag}")
+            self._log(f"  {item['text'][:40]}... → {amounts_str}{total_flag}")
         
         # Separar datos y totales
-        print("\n📊 Identificando estructura...")
+        self._log("\n📊 Identificando estructura...")
         structure = self.identify_data_rows_and_total(financial_data)
         
-        print(f"Filas de datos: {len(structure['data_rows'])}")
-        print(f"Filas de total: {len(structure['total_rows'])}")
+        self._log(f"Filas de datos: {len(structure['data_rows'])}")
+        self._log(f"Filas de total: {len(structure['total_rows'])}")
         
         # Validar cálculos
-        print("\n🔢 Validando cálculos...")
-        print("Sumando:")
+        self._log("\n🔢 Validando cálculos...")
+        self._log("Sumando:")
         validation = self.validate_financial_calculations(
             structure['data_rows'], 
             structure['total_rows']
         )
         
         # Mostrar resultados
-        print(f"\n📋 RESULTADO: {validation['summary']['status']}")
-        print(f"💬 {validation['summary']['message']}")
+        self._log(f"\n📋 RESULTADO: {validation['summary']['status']}")
+        self._log(f"💬 {validation['summary']['message']}")
         if validation['difference'] > 0:
-            print(f"🔍 Diferencia: ${validation['difference']:,.2f}")
+            self._log(f"🔍 Diferencia: {format_money(validation['difference'])}")
         
         # Compilar resultados
         results = {
@@ -316,28 +436,30 @@ class FinancialReportValidator:
             filepath = os.path.join(RESULTS_DIR, filename)
             os.makedirs(RESULTS_DIR, exist_ok=True)
             
+            # Armar el contenido completo y escribirlo de una sola vez
+            validation = results['validation']
+            parts = [
+                "VALIDACIÓN DE REPORTE FINANCIERO\n",
+                "=" * 40 + "\n\n",
+                f"RESULTADO: {validation['summary']['status']}\n",
+                f"DETALLE: {validation['summary']['message']}\n",
+                f"DIFERENCIA: {format_money(validation['difference'])}\n\n",
+                "CANTIDADES SUMADAS:\n",
+            ]
+            for i, amount in enumerate(validation['data_amounts'], 1):
+                parts.append(f"{i}. {format_money(amount)}\n")
+            
+            parts.append(f"\nSUMA CALCULADA: {format_money(validation['calculated_sum'])}\n")
+            parts.append(f"TOTAL REPORTADO: {format_money(validation['reported_total'])}\n")
+            parts.append(f"\n\nTEXTO ORIGINAL:\n{results['raw_text']}")
+            
             with open(filepath, 'w', encoding='utf-8') as f:
-                f.write("VALIDACIÓN DE REPORTE FINANCIERO\n")
-                f.write("=" * 40 + "\n\n")
-                
-                validation = results['validation']
-                f.write(f"RESULTADO: {validation['summary']['status']}\n")
-                f.write(f"DETALLE: {validation['summary']['message']}\n")
-                f.write(f"DIFERENCIA: ${validation['difference']:,.2f}\n\n")
-                
-                f.write("CANTIDADES SUMADAS:\n")
-                for i, amount in enumerate(validation['data_amounts'], 1):
-                    f.write(f"{i}. ${amount:,.2f}\n")
-                
-                f.write(f"\nSUMA CALCULADA: ${validation['calculated_sum']:,.2f}\n")
-                f.write(f"TOTAL REPORTADO: ${validation['reported_total']:,.2f}\n")
-                
-                f.write(f"\n\nTEXTO ORIGINAL:\n{results['raw_text']}")
+                f.write(''.join(parts))
             
-            print(f"💾 Resultados guardados en: {filepath}")
+            self._log(f"💾 Resultados guardados en: {filepath}")
             
         except Exception as e:
-            print(f"⚠️ Error guardando: {e}")
+            self._log(f"⚠️ Error guardando: {e}")
 
 def main():
     """Función principal"""
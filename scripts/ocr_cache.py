@@ -0,0 +1,58 @@
+# scripts/ocr_cache.py
+"""
+Caché en disco de resultados OCR de Vision API
+Cada texto se guarda indexado por el SHA-256 del contenido de la imagen
+"""
+
+import os
+import hashlib
+import tempfile
+from typing import Optional
+from config import RESULTS_DIR
+
+OCR_CACHE_DIR = os.path.join(RESULTS_DIR, ".ocr_cache")
+
+def content_key(content: bytes) -> str:
+    """Calcula la clave de caché a partir de los bytes de la imagen"""
+    return hashlib.sha256(content).hexdigest()
+
+def stat_key(image_path: str, stat_result: os.stat_result) -> str:
+    """
+    Clave rápida a partir de tamaño, fecha de modificación y nombre (sin leer la imagen)
+    Se pasa por SHA-256 para que use el mismo esquema de subcarpetas que content_key
+    """
+    descriptor = f"{stat_result.st_size}-{stat_result.st_mtime_ns}-{os.path.basename(image_path)}"
+    return hashlib.sha256(f"stat:{descriptor}".encode('utf-8')).hexdigest()
+
+def cache_path(key: str) -> str:
+    """
+    Ruta del archivo de caché para una clave
+    Usa subcarpetas con los dos primeros caracteres para no llenar un solo directorio
+    """
+    return os.path.join(OCR_CACHE_DIR, key[:2], key[2:] + ".txt")
+
+def load_cached_text(key: str) -> Optional[str]:
+    """Devuelve el texto guardado para la clave, o None si no existe"""
+    try:
+        with open(cache_path(key), 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"⚠️ Error leyendo caché OCR: {e}")
+        return None
+
+def store_cached_text(key: str, text: str):
+    """Guarda el texto de forma atómica (archivo temporal + os.replace)"""
+    path = cache_path(key)
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Error guardando caché OCR: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
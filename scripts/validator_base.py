@@ -0,0 +1,75 @@
+# scripts/validator_base.py
+"""
+Base común de los validadores de reportes
+Comparte un solo cliente de Vision API por transporte y la salida por hilos sin mezclarse
+"""
+
+import io
+import sys
+import functools
+import threading
+import contextlib
+from typing import TYPE_CHECKING
+from config import PROJECT_ID
+
+# google.cloud.vision se importa al crear el cliente, para no cargar gRPC si no se usa
+if TYPE_CHECKING:
+    from google.cloud import vision
+
+# Transportes del cliente de Vision API: gRPC rinde mejor en lotes, REST en llamadas sueltas
+GRPC_TRANSPORT = "grpc"
+REST_TRANSPORT = "rest"
+
+# Evita que la salida de varios hilos se mezcle al emitir cada reporte
+STDOUT_LOCK = threading.Lock()
+
+@functools.lru_cache(maxsize=2)
+def get_vision_client(transport: str = GRPC_TRANSPORT) -> 'vision.ImageAnnotatorClient':
+    """Crea el cliente de Vision API una sola vez por transporte y lo comparte entre validadores e hilos"""
+    from google.cloud import vision
+
+    return vision.ImageAnnotatorClient(transport=transport)
+
+class BaseValidator:
+    def __init__(self, transport: str = GRPC_TRANSPORT):
+        """
+        Inicializa lo común a todos los validadores
+
+        Args:
+            transport: Transporte del cliente ('grpc' para lotes, 'rest' para una sola imagen)
+        """
+        self.transport = transport
+        self.project_id = PROJECT_ID
+        self.verbose = True
+        self._local = threading.local()
+
+    @property
+    def client(self) -> 'vision.ImageAnnotatorClient':
+        """Cliente compartido de Vision API, creado solo cuando se necesita"""
+        return get_vision_client(self.transport)
+
+    def _emit(self, message: str):
+        """Imprime un mensaje, o lo acumula si el hilo actual usa salida en búfer"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            print(message)
+        else:
+            buffer.write(message + "\n")
+
+    def _log(self, message: str):
+        """Emite un mensaje de progreso solo si el modo detallado está activo"""
+        if self.verbose:
+            self._emit(message)
+
+    @contextlib.contextmanager
+    def _buffered_output(self):
+        """Acumula la salida del hilo actual y la emite en una sola escritura al terminar"""
+        self._local.buffer = io.StringIO()
+        try:
+            yield
+        finally:
+            output = self._local.buffer.getvalue()
+            self._local.buffer = None
+            with STDOUT_LOCK:
+                sys.stdout.write(output)
+                sys.stdout.flush()
@@ -7,36 +7,164 @@ Autor: [Tu nombre]
 
 import sys
 import os
+import io
 import re
-from typing import List, Dict, Tuple, Optional
-from google.cloud import vision
-from PIL import Image
-import numpy as np
-from config import PROJECT_ID, IMAGES_DIR, RESULTS_DIR
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
+from config import IMAGES_DIR, RESULTS_DIR, VISION_BATCH_SIZE, MAX_WORKERS
+from ocr_cache import content_key, load_cached_text, store_cached_text
+from validator_base import BaseValidator, get_vision_client, GRPC_TRANSPORT, REST_TRANSPORT
 
-class ReportValidator:
-    def __init__(self):
-        """Inicializa el validador con Vision API client"""
-        self.client = vision.ImageAnnotatorClient()
-        self.project_id = PROJECT_ID
+# google.cloud.vision (gRPC/protobuf), numpy y PIL se importan dentro de los métodos
+# que los usan, para que el arranque del script no pague su carga si no se necesitan
+if TYPE_CHECKING:
+    import numpy as np
+    from google.cloud import vision
+
+# Patrones precompilados para el procesamiento de texto
+_NUM_RE = re.compile(r'-?\d+\.?\d*')  # Números con decimales y negativos
+_ALPHA_RE = re.compile(r'[^\W\d_]')  # Cualquier letra (equivale a str.isalpha)
+_TOTAL_RE = re.compile(r'total|suma', re.IGNORECASE)  # Líneas que mencionan un total
+
+# Prefijo de las imágenes alojadas en Cloud Storage
+GCS_URI_PREFIX = "gs://"
+
+# Las imágenes con un lado mayor a este tamaño se reducen antes de enviarlas
+MAX_IMAGE_SIDE = 2048
+JPEG_QUALITY = 85
+
+# PNG blanco de 1x1 píxel usado para calentar la conexión con Vision API
+_TINY_PNG_BYTES = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAAAAAA6fptVAAAACklEQVR42mP4DwABAQEAHLCMmQAAAABJRU5ErkJggg=="
+)
+
+# Transportes cuyo precalentamiento ya se lanzó en este proceso
+_WARMED_TRANSPORTS = set()
+_WARMUP_LOCK = threading.Lock()
+
+def _warm_up_client(transport: str):
+    """Hace una petición mínima para abrir el canal gRPC (TLS + HTTP/2) antes de las llamadas reales"""
+    from google.cloud import vision
+    
+    try:
+        get_vision_client(transport).text_detection(image=vision.Image(content=_TINY_PNG_BYTES))
+    except Exception as e:
+        print(f"⚠️ No se pudo precalentar la conexión con Vision API: {e}")
+
+class ReportValidator(BaseValidator):
+    def __init__(self, transport: str = GRPC_TRANSPORT):
+        """
+        Inicializa el validador con el cliente compartido de Vision API
+        
+        Args:
+            transport: Transporte del cliente ('grpc' para lotes, 'rest' para una sola imagen)
+        """
+        super().__init__(transport)
+        
+        # Crear la carpeta de resultados una sola vez, no en cada guardado
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        
+        # Mensajes de progreso y resumen; en lotes grandes se desactivan con VV_VERBOSE=0
+        self.verbose = os.environ.get('VV_VERBOSE', '1') == '1'
+    
+    def _warm_up_in_background(self):
+        """
+        Abre la conexión con Vision API en otro hilo, una sola vez por proceso
+        No bloquea: la lectura de las demás imágenes sigue mientras se conecta
+        """
+        with _WARMUP_LOCK:
+            if self.transport in _WARMED_TRANSPORTS:
+                return
+            _WARMED_TRANSPORTS.add(self.transport)
+            self.client  # Crear el cliente compartido antes de lanzar el hilo
         
+        threading.Thread(target=_warm_up_client, args=(self.transport,), daemon=True).start()
+    
+    def _prepare_image(self, image_path: str) -> Tuple[Optional[str], Optional[str], Optional['vision.Image']]:
+        """
+        Prepara una imagen para enviarla a Vision API
+        
+        Args:
+            image_path: Ruta local o URI de Cloud Storage (gs://bucket/imagen.jpg)
+            
+        Returns:
+            Tuple: (texto en caché o None, clave de caché o None, vision.Image a enviar o None)
+        """
+        from google.cloud import vision
+        
+        # Imágenes en Cloud Storage: Vision las descarga directamente, sin subir los bytes
+        if image_path.startswith(GCS_URI_PREFIX):
+            return None, None, vision.Image(source=vision.ImageSource(image_uri=image_path))
+        
+        # Leer imagen
+        with open(image_path, 'rb') as image_file:
+            content = image_file.read()
+        
+        # Reutilizar OCR previo si la imagen no ha cambiado (a resolución completa o reducida)
+        key = content_key(content)
+        cached = load_cached_text(key)
+        if cached is not None:
+            return cached, key, None
+        
+        # El OCR de la imagen reducida se guarda aparte, para no mezclarlo con el de
+        # resolución completa que comparte la caché (ej: financial_validator)
+        resized_key = f"{key}-max{MAX_IMAGE_SIDE}"
+        cached = load_cached_text(resized_key)
+        if cached is not None:
+            return cached, resized_key, None
+        
+        content, resized = self._downscale_image(content)
+        return None, resized_key if resized else key, vision.Image(content=content)
+    
+    def _downscale_image(self, content: bytes) -> Tuple[bytes, bool]:
+        """
+        Reduce imágenes muy grandes para acortar la subida y el OCR
+        
+        Args:
+            content: Bytes originales de la imagen
+            
+        Returns:
+            Tuple: (JPEG redimensionado o los bytes originales, si se redimensionó)
+        """
+        try:
+            from PIL import Image, ImageOps
+            
+            with Image.open(io.BytesIO(content)) as img:
+                if max(img.size) <= MAX_IMAGE_SIDE:
+                    return content, False
+                
+                # Aplicar la orientación EXIF, que se pierde al recodificar a JPEG
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.LANCZOS)
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                
+                buffer = io.BytesIO()
+                img.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+                return buffer.getvalue(), True
+                
+        except Exception as e:
+            print(f"⚠️ No se pudo redimensionar la imagen: {e}")
+            return content, False
+    
     def extract_text_from_image(self, image_path: str) -> str:
         """
         Extrae texto de una imagen usando Vision API
+        El resultado de imágenes locales se guarda en caché en disco por contenido
         
         Args:
-            image_path: Ruta a la imagen
+            image_path: Ruta a la imagen o URI de Cloud Storage (gs://...)
             
         Returns:
             str: Texto extraído de la imagen
         """
         try:
-            # Leer imagen
-            with open(image_path, 'rb') as image_file:
-                content = image_file.read()
-            
-            # Crear objeto Image para Vision API
-            image = vision.Image(content=content)
+            cached, key, image = self._prepare_image(image_path)
+            if cached is not None:
+                return cached
             
             # Llamar a Vision API para detección de texto
             response = self.client.text_detection(image=image)
@@ -44,17 +172,98 @@ class ReportValidator:
             if response.error.message:
                 raise Exception(f'Error de Vision API: {response.error.message}')
             
-            # Extraer texto completo
+            # Extraer texto completo (el primer resultado contiene todo el texto)
             texts = response.text_annotations
-            if texts:
-                return texts[0].description  # Primer resultado contiene todo el texto
-            else:
-                return ""
+            text = texts[0].description if texts else ""
+            if key:
+                store_cached_text(key, text)
+            return text
                 
         except Exception as e:
             print(f"❌ Error extrayendo texto: {e}")
             return ""
     
+    def extract_texts_batch(self, image_paths: List[str], warm_up: bool = False) -> List[str]:
+        """
+        Extrae texto de varias imágenes con batch_annotate_images
+        Los grupos se procesan en hilos para que la lectura de un grupo
+        se solape con la llamada a Vision API del anterior
+        
+        Args:
+            image_paths: Rutas locales o URIs gs:// (se envían en grupos de VISION_BATCH_SIZE,
+                omitiendo las que ya tienen OCR en caché)
+            warm_up: Abrir la conexión en segundo plano al encontrar la primera imagen sin caché
+            
+        Returns:
+            List[str]: Texto extraído de cada imagen, en el mismo orden ("" si falla)
+        """
+        chunks = [image_paths[start:start + VISION_BATCH_SIZE]
+                  for start in range(0, len(image_paths), VISION_BATCH_SIZE)]
+        if not chunks:
+            return []
+        
+        texts = []
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(chunks))) as executor:
+            for chunk_texts in executor.map(
+                    lambda chunk: self._extract_texts_chunk(chunk, warm_up), chunks):
+                texts.extend(chunk_texts)
+        
+        return texts
+    
+    def _extract_texts_chunk(self, chunk: List[str], warm_up: bool = False) -> List[str]:
+        """Extrae el texto de un grupo de imágenes con una sola llamada a Vision API"""
+        from google.cloud import vision
+        
+        # Armar un request por cada imagen sin OCR en caché
+        chunk_texts = [""] * len(chunk)
+        pending = []  # (posición en el grupo, clave de caché, request)
+        for i, image_path in enumerate(chunk):
+            # Un error al leer una imagen solo afecta a esa imagen, no al grupo
+            try:
+                cached, key, image = self._prepare_image(image_path)
+            except Exception as e:
+                print(f"❌ Error leyendo {os.path.basename(image_path)}: {e}")
+                continue
+            
+            if cached is not None:
+                chunk_texts[i] = cached
+                continue
+            
+            if warm_up and not pending:
+                self._warm_up_in_background()
+            
+            pending.append((i, key, vision.AnnotateImageRequest(
+                image=image,
+                features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)]
+            )))
+        
+        if not pending:
+            return chunk_texts
+        
+        # Una sola llamada a Vision API para todo el grupo
+        try:
+            response = self.client.batch_annotate_images(
+                requests=[request for _, _, request in pending]
+            )
+            
+            for (i, key, _), image_response in zip(pending, response.responses):
+                if image_response.error.message:
+                    print(f"❌ Error de Vision API en {os.path.basename(chunk[i])}: "
+                          f"{image_response.error.message}")
+                    continue
+                
+                annotations = image_response.text_annotations
+                text = annotations[0].description if annotations else ""
+                if key:
+                    store_cached_text(key, text)
+                chunk_texts[i] = text
+            
+        except Exception as e:
+            # Las imágenes enviadas quedan en "", las que venían de caché se conservan
+            print(f"❌ Error extrayendo texto del lote: {e}")
+        
+        return chunk_texts
+    
     def clean_extracted_text(self, text: str) -> List[str]:
         """
         Limpia y organiza el texto extraído en líneas útiles
@@ -68,19 +277,11 @@ class ReportValidator:
         if not text:
             return []
         
-        # Dividir en líneas y limpiar
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            # Limpiar espacios extra y caracteres especiales
-            cleaned_line = re.sub(r'\s+', ' ', line.strip())
-            if cleaned_line and len(cleaned_line) > 1:  # Ignorar líneas muy cortas
-                cleaned_lines.append(cleaned_line)
-        
-        return cleaned_lines
+        # Dividir en líneas, colapsar espacios extra e ignorar líneas muy cortas
+        return [cleaned for line in text.splitlines()
+                if (cleaned := ' '.join(line.split())) and len(cleaned) > 1]
     
-    def extract_numbers_from_text(self, text: str) -> List[float]:
+    def extract_numbers_from_text(self, text: str) -> 'np.ndarray':
         """
         Extrae todos los números de una línea de texto
         
@@ -88,22 +289,13 @@ class ReportValidator:
             text: Línea de texto
             
         Returns:
-            List[float]: Lista de números encontrados
+            np.ndarray: Arreglo float64 con los números encontrados
         """
-        # Patrón para encontrar números (incluye decimales y negativos)
-        number_pattern = r'-?\d+\.?\d*'
-        matches = re.findall(number_pattern, text)
-        
-        numbers = []
-        for match in matches:
-            try:
-                # Convertir a float si es posible
-                num = float(match)
-                numbers.append(num)
-            except ValueError:
-                continue
+        import numpy as np
         
-        return numbers
+        # Buscar números (incluye decimales y negativos); NumPy convierte todo en C
+        matches = _NUM_RE.findall(text)
+        return np.array(matches, dtype=np.float64) if matches else np.empty(0)
     
     def detect_table_structure(self, lines: List[str]) -> Dict:
         """
@@ -119,22 +311,34 @@ class ReportValidator:
             'headers': [],
             'data_rows': [],
             'total_row': None,
+            'total_numbers': None,
             'summary': {}
         }
         
-        # Buscar encabezados (líneas con pocas o ningún número)
+        # Extraer los números de cada línea una sola vez
+        parsed = [(line, self.extract_numbers_from_text(line)) for line in lines]
+        
+        # Una sola pasada: clasificar encabezados/datos y recordar la última fila de total
         headers_found = False
-        for i, line in enumerate(lines):
-            numbers = self.extract_numbers_from_text(line)
+        collecting_rows = True  # Se deja de clasificar al llegar al encabezado de total
+        last_total = None
+        for line, numbers in parsed:
+            is_total_line = _TOTAL_RE.search(line) is not None
+            
+            # La fila de total es la última que lo menciona o que es solo un número
+            if is_total_line or line.strip().isdigit():
+                last_total = (line, numbers)
+            
+            if not collecting_rows:
+                continue
             
             # Si la línea tiene pocas números y contiene palabras, probablemente es encabezado
-            if len(numbers) <= 1 and any(char.isalpha() for char in line):
+            if len(numbers) <= 1 and _ALPHA_RE.search(line) is not None:
                 if not headers_found:
                     table_data['headers'].append(line)
                     headers_found = True
-                elif "total" in line.lower() or "suma" in line.lower():
-                    table_data['total_row'] = line
-                    break
+                elif is_total_line:
+                    collecting_rows = False
             else:
                 # Líneas con múltiples números son filas de datos
                 if len(numbers) >= 2:
@@ -143,12 +347,8 @@ class ReportValidator:
                         'numbers': numbers
                     })
         
-        # Buscar fila de total al final
-        for line in reversed(lines):
-            if ("total" in line.lower() or "suma" in line.lower() or 
-                line.strip().isdigit()):
-                table_data['total_row'] = line
-                break
+        if last_total is not None:
+            table_data['total_row'], table_data['total_numbers'] = last_total
         
         return table_data
     
@@ -162,6 +362,8 @@ class ReportValidator:
         Returns:
             Dict: Resultados de la validación
         """
+        import numpy as np
+        
         results = {
             'valid': False,
             'calculations': [],
@@ -173,36 +375,40 @@ class ReportValidator:
             results['errors'].append("No se encontraron filas de datos para validar")
             return results
         
-        # Extraer todos los números de las filas de datos
-        all_numbers = []
-        for row in table_data['data_rows']:
-            all_numbers.extend(row['numbers'])
+        # Unir los números de las filas de datos en un solo arreglo de NumPy
+        all_numbers = np.concatenate([row['numbers'] for row in table_data['data_rows']])
         
-        if not all_numbers:
+        if all_numbers.size == 0:
             results['errors'].append("No se encontraron números para calcular")
             return results
         
         # Calcular suma total
-        calculated_sum = sum(all_numbers)
+        calculated_sum = float(all_numbers.sum())
         
         # Buscar el total reportado
         reported_total = None
         if table_data['total_row']:
-            total_numbers = self.extract_numbers_from_text(table_data['total_row'])
-            if total_numbers:
+            # Reutilizar los números ya extraídos en detect_table_structure
+            total_numbers = table_data.get('total_numbers')
+            if total_numbers is None:
+                total_numbers = self.extract_numbers_from_text(table_data['total_row'])
+            if total_numbers.size:
                 # Tomar el número más grande como total reportado
-                reported_total = max(total_numbers)
+                reported_total = float(total_numbers.max())
         
         # Si no encontramos total en fila específica, buscar en todas las líneas
         if reported_total is None:
             # El número más grande podría ser el total
-            if all_numbers:
-                potential_total = max(all_numbers)
-                # Verificar si este número podría ser suma de los otros
-                others = [n for n in all_numbers if n != potential_total]
-                if others and abs(sum(others) - potential_total) < 0.01:
+            if all_numbers.size:
+                potential_total = float(all_numbers.max())
+                # Verificar si este número podría ser suma de los otros:
+                # la suma de los otros sale de la suma total ya calculada,
+                # descontando todas las apariciones del máximo
+                max_count = int(np.count_nonzero(all_numbers == potential_total))
+                others_sum = calculated_sum - max_count * potential_total
+                if max_count < all_numbers.size and abs(others_sum - potential_total) < 0.01:
                     reported_total = potential_total
-                    calculated_sum = sum(others)
+                    calculated_sum = others_sum
         
         # Validar el cálculo
         if reported_total is not None:
@@ -214,7 +420,7 @@ class ReportValidator:
                 'calculated_sum': calculated_sum,
                 'reported_total': reported_total,
                 'difference': difference,
-                'numbers_used': all_numbers,
+                'numbers_used': all_numbers.tolist(),
                 'summary': {
                     'status': '✅ CÁLCULO CORRECTO' if is_valid else '❌ ERROR EN CÁLCULO',
                     'message': f'Suma calculada: {calculated_sum}, Total reportado: {reported_total}'
@@ -224,42 +430,56 @@ class ReportValidator:
             results['errors'].append("No se pudo identificar el total reportado")
             results['summary'] = {
                 'status': '⚠️ NO SE PUDO VALIDAR',
-                'message': f'Números encontrados: {all_numbers}, Suma: {calculated_sum}'
+                'message': f'Números encontrados: {all_numbers.tolist()}, Suma: {calculated_sum}'
             }
         
         return results
     
-    def process_report_image(self, image_path: str, save_results: bool = True) -> Dict:
+    def process_report_image(self, image_path: str, save_results: bool = True,
+                             raw_text: Optional[str] = None, buffered: bool = False) -> Dict:
         """
         Función principal para procesar una imagen de reporte completa
         
         Args:
             image_path: Ruta a la imagen del reporte
             save_results: Si guardar resultados en archivo
+            raw_text: Texto ya extraído (ej: con extract_texts_batch); si es None se llama a Vision API
+            buffered: Acumular la salida del reporte y emitirla de una sola vez
+                (modo por lotes: evita que se mezcle la salida de varios hilos)
             
         Returns:
             Dict: Resultados completos del procesamiento
         """
-        print(f"\n📸 Procesando reporte: {os.path.basename(image_path)}")
-        print("=" * 50)
+        if not buffered:
+            return self._process_report_image(image_path, save_results, raw_text)
+        
+        with self._buffered_output():
+            return self._process_report_image(image_path, save_results, raw_text)
+    
+    def _process_report_image(self, image_path: str, save_results: bool,
+                              raw_text: Optional[str]) -> Dict:
+        """Pasos del procesamiento de una imagen (ver process_report_image)"""
+        self._log(f"\n📸 Procesando reporte: {os.path.basename(image_path)}")
+        self._log("=" * 50)
         
         # Paso 1: Extraer texto
-        print("🔍 Extrayendo texto con Vision API...")
-        raw_text = self.extract_text_from_image(image_path)
+        if raw_text is None:
+            self._log("🔍 Extrayendo texto con Vision API...")
+            raw_text = self.extract_text_from_image(image_path)
         
         if not raw_text:
             return {'error': 'No se pudo extraer texto de la imagen'}
         
         # Paso 2: Limpiar texto
-        print("🧹 Limpiando y organizando texto...")
+        self._log("🧹 Limpiando y organizando texto...")
         cleaned_lines = self.clean_extracted_text(raw_text)
         
         # Paso 3: Detectar estructura de tabla
-        print("📊 Detectando estructura de tabla...")
+        self._log("📊 Detectando estructura de tabla...")
         table_data = self.detect_table_structure(cleaned_lines)
         
         # Paso 4: Validar cálculos
-        print("🔢 Validando cálculos...")
+        self._log("🔢 Validando cálculos...")
         validation_results = self.validate_calculations(table_data)
         
         # Compilar resultados completos
@@ -269,7 +489,7 @@ class ReportValidator:
             'cleaned_lines': cleaned_lines,
             'table_structure': table_data,
             'validation': validation_results,
-            'timestamp': str(np.datetime64('now'))
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds')
         }
         
         # Mostrar resumen
@@ -283,30 +503,30 @@ class ReportValidator:
     
     def print_results_summary(self, results: Dict):
         """Imprime un resumen de los resultados"""
-        print("\n📋 RESUMEN DE RESULTADOS")
-        print("=" * 50)
+        self._log("\n📋 RESUMEN DE RESULTADOS")
+        self._log("=" * 50)
         
         validation = results.get('validation', {})
         
         if 'error' in results:
-            print(f"❌ Error: {results['error']}")
+            self._log(f"❌ Error: {results['error']}")
             return
         
         if validation.get('summary'):
-            print(f"Estado: {validation['summary']['status']}")
-            print(f"Detalle: {validation['summary']['message']}")
+            self._log(f"Estado: {validation['summary']['status']}")
+            self._log(f"Detalle: {validation['summary']['message']}")
             
         if validation.get('calculated_sum') is not None:
-            print(f"\n📊 Detalles del cálculo:")
-            print(f"   Números encontrados: {validation.get('numbers_used', [])}")
-            print(f"   Suma calculada: {validation.get('calculated_sum', 0)}")
-            print(f"   Total reportado: {validation.get('reported_total', 0)}")
-            print(f"   Diferencia: {validation.get('difference', 0)}")
+            self._log(f"\n📊 Detalles del cálculo:")
+            self._log(f"   Números encontrados: {validation.get('numbers_used', [])}")
+            self._log(f"   Suma calculada: {validation.get('calculated_sum', 0)}")
+            self._log(f"   Total reportado: {validation.get('reported_total', 0)}")
+            self._log(f"   Diferencia: {validation.get('difference', 0)}")
         
         if validation.get('errors'):
-            print(f"\n⚠️ Errores encontrados:")
+            self._log(f"\n⚠️ Errores encontrados:")
             for error in validation['errors']:
-                print(f"   - {error}")
+                self._log(f"   - {error}")
     
     def save_results_to_file(self, results: Dict):
         """Guarda los resultados en un archivo de texto"""
@@ -314,32 +534,33 @@ class ReportValidator:
             filename = f"resultado_{os.path.basename(results['file_path'])}.txt"
             filepath = os.path.join(RESULTS_DIR, filename)
             
-            os.makedirs(RESULTS_DIR, exist_ok=True)
+            # Armar el contenido completo y escribirlo de una sola vez
+            parts = [
+                "REPORTE DE VALIDACIÓN DE CÁLCULOS\n",
+                "=" * 40 + "\n\n",
+                f"Archivo procesado: {results['file_path']}\n",
+                f"Timestamp: {results['timestamp']}\n\n",
+            ]
+            
+            validation = results.get('validation', {})
+            if validation.get('summary'):
+                parts.append(f"RESULTADO: {validation['summary']['status']}\n")
+                parts.append(f"DETALLE: {validation['summary']['message']}\n\n")
+            
+            parts.append("TEXTO EXTRAÍDO:\n")
+            parts.append("-" * 20 + "\n")
+            parts.append(results.get('raw_text', 'No disponible'))
             
             with open(filepath, 'w', encoding='utf-8') as f:
-                f.write("REPORTE DE VALIDACIÓN DE CÁLCULOS\n")
-                f.write("=" * 40 + "\n\n")
-                f.write(f"Archivo procesado: {results['file_path']}\n")
-                f.write(f"Timestamp: {results['timestamp']}\n\n")
-                
-                validation = results.get('validation', {})
-                if validation.get('summary'):
-                    f.write(f"RESULTADO: {validation['summary']['status']}\n")
-                    f.write(f"DETALLE: {validation['summary']['message']}\n\n")
-                
-                f.write("TEXTO EXTRAÍDO:\n")
-                f.write("-" * 20 + "\n")
-                f.write(results.get('raw_text', 'No disponible'))
-                
-            print(f"💾 Resultados guardados en: {filepath}")
+                f.write(''.join(parts))
+            
+            self._log(f"💾 Resultados guardados en: {filepath}")
             
         except Exception as e:
-            print(f"⚠️ Error guardando resultados: {e}")
+            self._emit(f"⚠️ Error guardando resultados: {e}")
 
 def main():
     """Función principal de ejemplo"""
-    validator = ReportValidator()
-    
     # Ejemplo de uso
     print("🚀 VALIDADOR DE REPORTES CON VISION API")
     print("=" * 50)
@@ -358,11 +579,23 @@ def main():
             for i, img in enumerate(image_files, 1):
                 print(f"   {i}. {img}")
             
-            # Procesar la primera imagen como ejemplo
-            if len(image_files) > 0:
-                sample_image = os.path.join(IMAGES_DIR, image_files[0])
-                print(f"\n🔍 Procesando imagen de muestra: {image_files[0]}")
-                validator.process_report_image(sample_image)
+            # Crear el cliente de Vision API solo cuando hay algo que procesar;
+            # una sola imagen evita el costo de arranque de gRPC usando REST
+            transport = REST_TRANSPORT if len(image_files) == 1 else GRPC_TRANSPORT
+            validator = ReportValidator(transport=transport)
+            
+            # Extraer el texto de todas las imágenes con llamadas por lotes
+            image_paths = [os.path.join(IMAGES_DIR, img) for img in image_files]
+            print(f"\n🔍 Extrayendo texto de {len(image_paths)} imágenes con Vision API...")
+            texts = validator.extract_texts_batch(image_paths, warm_up=transport == GRPC_TRANSPORT)
+            
+            # Procesar localmente cada imagen en paralelo
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(image_paths))) as executor:
+                list(executor.map(
+                    lambda image_path, raw_text: validator.process_report_image(
+                        image_path, raw_text=raw_text, buffered=True),
+                    image_paths, texts
+                ))
         else:
             print(f"\n📁 No se encontraron imágenes en {IMAGES_DIR}")
             print("   Coloca archivos .jpg, .png, etc. en esa carpeta")